@@ -7,7 +7,6 @@ This script creates the instance with optimal specs and runs complete setup.
 import argparse
 import json
 import sys
-import time
 from pathlib import Path
 
 # Add parent directory to path for thunder_compute_manager import
@@ -66,24 +65,13 @@ def main():
                 print(f"  python local_scripts/setup_kohya_instance_complete.py -i {instance_id}")
                 return
             
-            # Wait for SSH to be available with retry logic
+            # Wait for SSH to be available (probes every second, 3s connect timeout)
             print("Waiting for SSH to be available...")
-            max_retries = 12  # 2 minutes total
-            for attempt in range(max_retries):
-                try:
-                    print(f"Attempting SSH connection (attempt {attempt + 1}/{max_retries})...")
-                    ssh = manager.connect_ssh(instance_id)
-                    # Test the connection
-                    manager._run_ssh_command(ssh, "echo 'SSH ready'")
-                    print("SSH connection established!")
-                    break
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        print(f"SSH not ready yet, waiting 10s... ({e})")
-                        time.sleep(10)
-                    else:
-                        print(f"SSH connection failed after {max_retries} attempts")
-                        raise
+            ssh_timeout = 180
+            if not manager.wait_for_ssh(instance_id, timeout=ssh_timeout):
+                print(f"SSH connection failed after {ssh_timeout}s")
+                raise RuntimeError(f"SSH not available on instance {instance_id} after {ssh_timeout}s")
+            print("SSH connection established!")
             
             # Run complete Kohya_SS setup
             print(f"\nStarting Kohya_SS setup (timeout: {args.setup_timeout}s)...")
@@ -97,41 +85,53 @@ def main():
             # Upload all remote scripts
             print("Uploading setup scripts...")
             scripts_dir = Path(__file__).parent.parent / "remote_scripts"
-            manager.upload_directory(instance_id, str(scripts_dir), "/home/ubuntu/remote_scripts")
+            # OpenSSH's ControlMaster (see ssh_command) stays up for later runs
+            manager.upload_directory_tar(instance_id, str(scripts_dir), "/home/ubuntu/remote_scripts",
+                                         openssh=manager.openssh_available())
             
             # Make scripts executable and install tmux
             ssh = manager.connect_ssh(instance_id)
             print("Installing tmux and making scripts executable...")
             
-            # Install tmux with proper error checking
-            exit_code, out, err = manager._run_ssh_command(ssh, "sudo apt update && sudo apt install -y tmux")
-            if exit_code != 0:
-                print(f"❌ Failed to install tmux: {err}")
-                raise RuntimeError(f"tmux installation failed: {err}")
-            print("✅ tmux installed successfully")
-            
-            # Make scripts executable
-            exit_code, out, err = manager._run_ssh_command(ssh, "chmod +x /home/ubuntu/remote_scripts/*.sh")
-            if exit_code != 0:
-                print(f"❌ Failed to make scripts executable: {err}")
-                raise RuntimeError(f"chmod failed: {err}")
-            print("✅ Scripts made executable")
+            # Install tmux and chmod the scripts in a single SSH exec
+            exit_code, out, err = manager._run_ssh_command(
+                ssh,
+                "set -e; "
+                "sudo apt-get update -qq && "
+                "sudo DEBIAN_FRONTEND=noninteractive apt-get install -y -qq tmux && "
+                "chmod +x /home/ubuntu/remote_scripts/*.sh && "
+                "echo OK",
+                timeout=600
+            )
+            if exit_code != 0 or not out.strip().endswith("OK"):
+                print(f"❌ Failed to install tmux / make scripts executable: {err or out}")
+                raise RuntimeError(f"Instance preparation failed: {err or out}")
+            print("✅ tmux installed and scripts made executable")
             
-            # Start tmux session and run full setup
+            # Run full setup in tmux; the session is created on first use
             session_name = "kohya-setup"
-            manager.start_tmux_session(instance_id, session_name, cwd="/home/ubuntu")
             
-            # Execute full_setup_kohya.sh
-            manager.run_script_in_tmux(
+            # Execute full_setup_kohya.sh, teeing its output to a log on the instance
+            setup_log = f"/home/ubuntu/{session_name}.log"
+            setup_exit = manager.run_script_in_tmux(
                 instance_id,
                 session_name,
                 "/home/ubuntu/remote_scripts/full_setup_kohya.sh",
                 wait_for_completion=True,
-                wait_timeout=args.setup_timeout
+                cwd="/home/ubuntu",
+                wait_timeout=args.setup_timeout,
+                log_path=setup_log,
+                ssh=ssh
             )
             
-            # Get and check setup output
-            output = manager.get_tmux_output(instance_id, session_name)
+            # Require a zero exit code and the completion marker on the
+            # instance; only fetch the end of the log when it is going to be shown
+            setup_ok = setup_exit == 0 and manager.remote_file_contains(instance_id, setup_log, "Full Kohya_SS setup complete", ssh=ssh)
+            if setup_exit is None:
+                print(f"Setup did not finish within {args.setup_timeout}s")
+            elif setup_exit != 0:
+                print(f"Setup script exited with code {setup_exit}")
+            output = manager.tail_remote_file(instance_id, setup_log, ssh=ssh) if args.verbose or not setup_ok else ""
             
             if args.verbose:
                 print("\n" + "="*60)
@@ -141,7 +141,7 @@ def main():
                 print("="*60 + "\n")
             
             # Check setup success
-            if "Full Kohya_SS setup complete" in output:
+            if setup_ok:
                 print("✅ Kohya_SS setup completed successfully!")
                 print(f"\nInstance {instance_id} is ready for LoRA training!")
                 
@@ -171,6 +171,7 @@ def main():
                 print(f"\nTo debug:")
                 print(f"  tnr connect {instance_id}")
                 print(f"  tmux attach -t {session_name}")
+                print(f"  Full log on the instance: {setup_log}")
                 sys.exit(1)
                 
     except Exception as e:
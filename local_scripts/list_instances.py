@@ -33,12 +33,14 @@ def main():
                       help="Filter by status")
     parser.add_argument("--json", action="store_true",
                       help="Output raw JSON")
+    parser.add_argument("--no-cache", action="store_true",
+                      help="Always fetch a fresh instance list from the API")
     args = parser.parse_args()
     
     try:
         with ThunderComputeManager.from_secrets() as manager:
             print("Fetching instance list...")
-            instances = manager.list_instances(force_refresh=True)
+            instances = manager.list_instances(force_refresh=args.no_cache)
             
             if not instances:
                 print("No instances found.")
@@ -58,12 +60,17 @@ def main():
             if args.json:
                 print(json.dumps(instances, indent=2))
             else:
+                # Pretty-print details only for a terminal; piped output gets
+                # one compact JSON line per instance. Write everything at once.
+                detail_indent = 4 if sys.stdout.isatty() else None
+                lines = []
                 for instance_id, info in instances.items():
-                    print(format_instance_info(instance_id, info))
+                    lines.append(format_instance_info(instance_id, info))
                     
                     if args.verbose:
-                        print(f"  Full details: {json.dumps(info, indent=4)}")
-                        print()
+                        lines.append(f"  Full details: {json.dumps(info, indent=detail_indent)}")
+                        lines.append("")
+                print("\n".join(lines))
                         
     except Exception as e:
         print(f"Error: {e}")
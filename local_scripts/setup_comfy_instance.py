@@ -19,6 +19,8 @@ def main():
                       help="ThunderCompute instance ID")
     parser.add_argument("--skip-upload", action="store_true",
                       help="Skip uploading remote scripts (if already present)")
+    parser.add_argument("--force-upload", action="store_true",
+                      help="Upload remote scripts even if the instance copy is up to date")
     parser.add_argument("--skip-models", action="store_true",
                       help="Skip downloading ComfyUI models")
     parser.add_argument("-v", "--verbose", action="store_true",
@@ -44,31 +46,44 @@ def main():
                     sys.exit(1)
                 print("Instance is now running")
             
+            # One connection for the whole run; each command gets its own channel
+            ssh = manager.connect_ssh(instance_id)
+            
             # Upload remote scripts if not skipping
             if not args.skip_upload:
                 print("Uploading remote scripts...")
                 scripts_dir = Path(__file__).parent.parent / "remote_scripts"
-                manager.upload_directory(instance_id, str(scripts_dir), "/home/ubuntu/remote_scripts")
-                
-                # Make scripts executable
-                ssh = manager.connect_ssh(instance_id)
-                ssh.exec_command("chmod +x /home/ubuntu/remote_scripts/*.sh")
-                print("Scripts uploaded and made executable")
+                if manager.upload_directory_if_changed(instance_id, str(scripts_dir), "/home/ubuntu/remote_scripts",
+                                                       force=args.force_upload,
+                                                       openssh=manager.openssh_available()):
+                    # Make scripts executable
+                    manager._run_ssh_command(ssh, "chmod +x /home/ubuntu/remote_scripts/*.sh", timeout=30)
+                    print("Scripts uploaded and made executable")
+                else:
+                    print("Remote scripts already up to date, skipping upload")
             
             # Run full setup
             print("Starting ComfyUI setup (this may take 10-20 minutes)...")
-            manager.start_tmux_session(instance_id, "comfy-setup", cwd="/home/ubuntu")
-            
-            manager.run_script_in_tmux(
+            setup_log = "/home/ubuntu/comfy-setup.log"
+            setup_exit = manager.run_script_in_tmux(
                 instance_id, 
                 "comfy-setup", 
                 "/home/ubuntu/remote_scripts/full_setup.sh",
                 wait_for_completion=True,
-                wait_timeout=args.timeout
+                cwd="/home/ubuntu",
+                wait_timeout=args.timeout,
+                log_path=setup_log,
+                ssh=ssh
             )
             
-            # Get setup output
-            setup_output = manager.get_tmux_output(instance_id, "comfy-setup")
+            # Require a zero exit code and the completion marker on the
+            # instance; only fetch the end of the log when it is going to be shown
+            setup_ok = setup_exit == 0 and manager.remote_file_contains(instance_id, setup_log, "Full setup complete", ssh=ssh)
+            if setup_exit is None:
+                print(f"Setup did not finish within {args.timeout}s")
+            elif setup_exit != 0:
+                print(f"Setup script exited with code {setup_exit}")
+            setup_output = manager.tail_remote_file(instance_id, setup_log, ssh=ssh) if args.verbose or not setup_ok else ""
             
             if args.verbose:
                 print("\n=== Setup Output ===")
@@ -76,25 +91,31 @@ def main():
                 print("=== End Output ===\n")
             
             # Check if setup was successful
-            if "Full setup complete" in setup_output:
+            if setup_ok:
                 print("✓ ComfyUI setup completed successfully!")
                 
                 # Test conda and comfy installation
                 print("Testing installation...")
-                ssh = manager.connect_ssh(instance_id)
                 
-                # Test conda
-                exit_code, out, err = ssh.exec_command("source ~/.bashrc && conda --version")
-                if exit_code == 0:
-                    print(f"✓ Conda installed: {out.strip()}")
+                # Test conda and the comfy CLI in one exec, calling conda directly
+                # rather than sourcing ~/.bashrc. Exit code 2 means conda works
+                # but the comfy CLI failed; anything else nonzero (1, 127, an
+                # SSH error) means conda itself couldn't be checked.
+                exit_code, out, err = manager._run_ssh_command(
+                    ssh,
+                    "C=~/miniforge3/bin/conda; "
+                    "$C --version || exit 1; "
+                    "$C run -n comfy-env comfy --help >/dev/null || exit 2",
+                    timeout=120
+                )
+                if exit_code in (0, 2):
+                    print(f"✓ Conda installed: {out.strip().splitlines()[0] if out.strip() else 'unknown version'}")
                 else:
-                    print(f"✗ Conda test failed: {err}")
+                    print(f"✗ Conda test failed (exit code {exit_code}): {err}")
                 
-                # Test comfy CLI
-                exit_code, out, err = ssh.exec_command("source ~/.bashrc && conda activate comfy-env && comfy --help")
                 if exit_code == 0:
                     print("✓ ComfyUI CLI installed successfully")
-                else:
+                elif exit_code == 2:
                     print(f"✗ ComfyUI CLI test failed: {err}")
                 
                 print(f"\nInstance {instance_id} is ready for ComfyUI development!")
@@ -103,6 +124,9 @@ def main():
             else:
                 print("✗ Setup may have failed. Check the output above.")
                 if not args.verbose:
+                    print("\nLast few lines of output:")
+                    for line in setup_output.strip().split('\n')[-10:]:
+                        print(f"  {line}")
                     print("Run with --verbose to see full output")
                 sys.exit(1)
                 
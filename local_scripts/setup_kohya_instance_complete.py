@@ -21,6 +21,8 @@ def main():
                       help="Timeout for setup in seconds (default: 3600)")
     parser.add_argument("-v", "--verbose", action="store_true",
                       help="Show detailed output")
+    parser.add_argument("--force-upload", action="store_true",
+                      help="Upload remote scripts even if the instance copy is up to date")
     parser.add_argument("--session-name", default="kohya-setup",
                       help="Tmux session name (default: kohya-setup)")
     args = parser.parse_args()
@@ -42,39 +44,51 @@ def main():
                     sys.exit(1)
                 print("Instance is now running")
             
+            # One connection for the whole run; each command gets its own channel
+            ssh = manager.connect_ssh(instance_id)
+            
             # Upload all remote scripts
             print("Uploading remote scripts to instance...")
             scripts_dir = Path(__file__).parent.parent / "remote_scripts"
-            manager.upload_directory(instance_id, str(scripts_dir), "/home/ubuntu/remote_scripts")
-            
-            # Make all scripts executable
-            print("Making scripts executable...")
-            ssh = manager.connect_ssh(instance_id)
-            exit_code, out, err = ssh.exec_command("chmod +x /home/ubuntu/remote_scripts/*.sh")
-            if exit_code != 0:
-                print(f"Warning: Failed to make scripts executable: {err}")
-            
-            print("Scripts uploaded successfully")
+            if manager.upload_directory_if_changed(instance_id, str(scripts_dir), "/home/ubuntu/remote_scripts",
+                                                   force=args.force_upload,
+                                                   openssh=manager.openssh_available()):
+                # Make all scripts executable
+                print("Making scripts executable...")
+                exit_code, out, err = manager._run_ssh_command(ssh, "chmod +x /home/ubuntu/remote_scripts/*.sh", timeout=30)
+                if exit_code != 0:
+                    print(f"Warning: Failed to make scripts executable: {err}")
+                
+                print("Scripts uploaded successfully")
+            else:
+                print("Remote scripts already up to date, skipping upload")
             
             # Start tmux session and run full setup
             print(f"Starting Kohya_SS setup in tmux session '{args.session_name}'...")
             print("This will install system dependencies, CUDA 12.8, and Kohya_SS")
             print(f"Estimated time: 20-40 minutes (timeout: {args.timeout}s)")
             
-            manager.start_tmux_session(instance_id, args.session_name, cwd="/home/ubuntu")
-            
-            # Execute full_setup_kohya.sh
-            manager.run_script_in_tmux(
+            # Execute full_setup_kohya.sh, teeing its output to a log on the instance
+            setup_log = f"/home/ubuntu/{args.session_name}.log"
+            setup_exit = manager.run_script_in_tmux(
                 instance_id,
                 args.session_name,
                 "/home/ubuntu/remote_scripts/full_setup_kohya.sh",
                 wait_for_completion=True,
-                wait_timeout=args.timeout
+                cwd="/home/ubuntu",
+                wait_timeout=args.timeout,
+                log_path=setup_log,
+                ssh=ssh
             )
             
-            # Get and display output
-            print("\nRetrieving setup output...")
-            output = manager.get_tmux_output(instance_id, args.session_name)
+            # Require a zero exit code and the completion marker on the
+            # instance; only fetch the end of the log when it is going to be shown
+            setup_ok = setup_exit == 0 and manager.remote_file_contains(instance_id, setup_log, "Full Kohya_SS setup complete", ssh=ssh)
+            if setup_exit is None:
+                print(f"Setup did not finish within {args.timeout}s")
+            elif setup_exit != 0:
+                print(f"Setup script exited with code {setup_exit}")
+            output = manager.tail_remote_file(instance_id, setup_log, ssh=ssh) if args.verbose or not setup_ok else ""
             
             if args.verbose:
                 print("\n" + "="*60)
@@ -84,7 +98,7 @@ def main():
                 print("="*60 + "\n")
             
             # Check if setup completed successfully
-            if "Full Kohya_SS setup complete" in output:
+            if setup_ok:
                 print("✅ Kohya_SS setup completed successfully!")
                 print("\nWhat was installed:")
                 print("  ✓ System dependencies (Python 3.11, Git)")
@@ -111,6 +125,7 @@ def main():
                 
                 print(f"\nTo debug, connect to tmux session:")
                 print(f"  tmux attach -t {args.session_name}")
+                print(f"  Full log on the instance: {setup_log}")
                 sys.exit(1)
                 
     except Exception as e:
@@ -1,14 +1,44 @@
 #!/usr/bin/env python3
 
 import argparse
+import re
 import sys
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from thunder_compute_manager import ThunderComputeManager
 
+# grep -E pattern for the quick tunnel URL printed by cloudflared
+TUNNEL_URL_PATTERN = r'https://[a-z0-9-]+\.trycloudflare\.com'
+TUNNEL_RE = re.compile(TUNNEL_URL_PATTERN)
+# cloudflared prints this once the edge accepts a connection; the quick tunnel
+# URL is printed earlier and only starts serving after it
+TUNNEL_READY_PATTERN = r'Registered tunnel connection'
+# ComfyUI's startup banner, for whichever address/port it was given
+COMFY_READY_RE = re.compile(r'To see the GUI go to: http://[\d.]+:\d+')
+
+
+def session_log_path(session_name):
+    """Remote log file that mirrors a tmux session's output."""
+    return f"/tmp/tmux_{session_name}.log"
+
+
+def launch_session(manager, ssh, instance_id, session_name, command):
+    """Start a tmux session, mirror its output to a log file, and send a command to it."""
+    manager.start_tmux_session(instance_id, session_name, ssh=ssh)
+    # pipe_tmux_output truncates any old log and quotes the session and path
+    manager.pipe_tmux_output(instance_id, session_name, session_log_path(session_name), ssh=ssh)
+    manager.run_tmux_commands(instance_id, [["send-keys", "-t", session_name, command, "Enter"]], ssh=ssh)
+
+
+def split_lines(pending, chunk):
+    """Split newly read output into complete lines, carrying a partial last line over."""
+    lines = (pending + chunk).split('\n')
+    return lines[:-1], lines[-1]
+
 
 def main():
     parser = argparse.ArgumentParser(description="Start Cloudflare tunnel and ComfyUI on Thunder instance")
@@ -43,106 +73,136 @@ def main():
             manager.wait_for_status(args.instance_id, "RUNNING")
             print("Instance is now running")
         
-        # Install cloudflared if requested
-        if args.install_cloudflared:
-            if args.verbose:
-                print("Installing cloudflared...")
-            manager.run_script_in_tmux(
-                args.instance_id, 
-                "install_cloudflared", 
-                "/home/ubuntu/remote_scripts/install_cloudflared.sh",
-                wait_for_completion=True,
-                wait_timeout=300
-            )
-        
-        # Start Cloudflare tunnel in tmux
-        if args.verbose:
-            print(f"Starting Cloudflare tunnel on port {args.port} in tmux session '{args.tunnel_session}'")
-        
-        tunnel_command = f"cd /home/ubuntu && cloudflared tunnel --url localhost:{args.port}"
-        manager.start_tmux_session(args.instance_id, args.tunnel_session)
-        
-        # Send command to tmux session using SSH connection
+        # One connection for the whole run; each command gets its own channel
         ssh = manager.connect_ssh(args.instance_id)
-        manager._run_ssh_command(ssh, f"tmux send-keys -t {args.tunnel_session} '{tunnel_command}' Enter")
-        
-        # Wait a moment for tunnel to start
-        time.sleep(5)
-        
-        # Start ComfyUI in separate tmux session
-        if args.verbose:
-            print(f"Starting ComfyUI in tmux session '{args.comfy_session}'")
         
+        tunnel_command = f"cd /home/ubuntu && cloudflared tunnel --url localhost:{args.port}"
         comfy_command = f"cd /home/ubuntu/comfy/ComfyUI && conda activate comfy-env && python main.py --listen 0.0.0.0 --port {args.port}"
-        manager.start_tmux_session(args.instance_id, args.comfy_session)
-        
-        # Send command to tmux session using SSH connection
-        manager._run_ssh_command(ssh, f"tmux send-keys -t {args.comfy_session} '{comfy_command}' Enter")
-        
-        # Capture tunnel output and save to file
-        if args.verbose:
-            print(f"Capturing tunnel output to {output_file}")
         
-        tunnel_url = None
-        comfy_ready = False
-        start_time = time.time()
-        max_wait_time = 60 if args.wait_for_url else 10
-        
-        with open(output_file, 'w') as f:
-            f.write(f"Tunnel output for instance {args.instance_id} started at {datetime.now()}\n")
-            f.write(f"Port: {args.port}\n")
-            f.write("=" * 50 + "\n\n")
+        # Start ComfyUI right away: it does not depend on cloudflared, so its
+        # startup overlaps the cloudflared install. Only the tunnel waits.
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            if args.verbose:
+                print(f"Starting ComfyUI in tmux session '{args.comfy_session}'")
+            comfy_launch = pool.submit(launch_session, manager, ssh, args.instance_id, args.comfy_session, comfy_command)
+            
+            # Install cloudflared if requested
+            if args.install_cloudflared:
+                if args.verbose:
+                    print("Installing cloudflared...")
+                manager.run_script_in_tmux(
+                    args.instance_id, 
+                    "install_cloudflared", 
+                    "/home/ubuntu/remote_scripts/install_cloudflared.sh",
+                    wait_for_completion=True,
+                    wait_timeout=300,
+                    ssh=ssh
+                )
+            
+            # Start Cloudflare tunnel in its own tmux session
+            if args.verbose:
+                print(f"Starting Cloudflare tunnel on port {args.port} in tmux session '{args.tunnel_session}'")
+            launch_session(manager, ssh, args.instance_id, args.tunnel_session, tunnel_command)
+            comfy_launch.result()
+            
+            # Capture tunnel output and save to file
+            if args.verbose:
+                print(f"Capturing tunnel output to {output_file}")
+            
+            tunnel_url = None
+            tunnel_ready = False
+            comfy_ready = False
+            start_time = time.time()
+            max_wait_time = 60 if args.wait_for_url else 10
+            
+            # Only the output appended since the previous tick is transferred and
+            # scanned, so each poll costs O(new output) rather than O(scrollback)
+            tunnel_log = session_log_path(args.tunnel_session)
+            comfy_log = session_log_path(args.comfy_session)
+            tunnel_offset = comfy_offset = 0
+            tunnel_pending = comfy_pending = ""
+            
+            # The URL and the ready marker are matched on the instance and pushed
+            # back as soon as they are printed
+            url_wait = ready_wait = None
+            if args.wait_for_url:
+                url_wait = pool.submit(manager.wait_for_remote_pattern, args.instance_id,
+                                       tunnel_log, TUNNEL_URL_PATTERN, max_wait_time, ssh=ssh)
+                ready_wait = pool.submit(manager.wait_for_remote_pattern, args.instance_id,
+                                         tunnel_log, TUNNEL_READY_PATTERN, max_wait_time, ssh=ssh)
             
-            while time.time() - start_time < max_wait_time:
-                try:
-                    # Check tunnel output
-                    tunnel_output = manager.get_tmux_output(args.instance_id, args.tunnel_session)
-                    if tunnel_output:
-                        f.write("=== TUNNEL OUTPUT ===\n")
-                        f.write(tunnel_output)
-                        f.write("\n")
-                        f.flush()
+            with open(output_file, 'w') as f:
+                f.write(f"Tunnel output for instance {args.instance_id} started at {datetime.now()}\n")
+                f.write(f"Port: {args.port}\n")
+                f.write("=" * 50 + "\n\n")
+                
+                while time.time() - start_time < max_wait_time:
+                    try:
+                        # Fetch new output from both sessions concurrently
+                        tunnel_poll = pool.submit(manager.read_remote_file, args.instance_id, tunnel_log, tunnel_offset, ssh=ssh)
+                        comfy_poll = pool.submit(manager.read_remote_file, args.instance_id, comfy_log, comfy_offset, ssh=ssh)
+                        tunnel_output, tunnel_offset = tunnel_poll.result()
+                        comfy_output, comfy_offset = comfy_poll.result()
                         
-                        # Look for tunnel URL in the specific format
-                        if args.wait_for_url and not tunnel_url:
-                            lines = tunnel_output.split('\n')
-                            for line in lines:
-                                # Look for the specific URL line format
-                                if 'https://' in line and 'trycloudflare.com' in line and '|' in line:
-                                    # Extract URL from the boxed message
-                                    url_start = line.find('https://')
-                                    if url_start != -1:
-                                        url_end = line.find(' ', url_start)
-                                        if url_end == -1:
-                                            url_end = line.find('|', url_start)
-                                        if url_end == -1:
-                                            url_end = len(line)
-                                        tunnel_url = line[url_start:url_end].strip()
-                                        print(f"\n🌐 Tunnel URL found: {tunnel_url}")
-                                        break
-                    
-                    # Check ComfyUI output
-                    comfy_output = manager.get_tmux_output(args.instance_id, args.comfy_session)
-                    if comfy_output:
-                        f.write("=== COMFYUI OUTPUT ===\n")
-                        f.write(comfy_output)
-                        f.write("\n")
-                        f.flush()
+                        # Check tunnel output
+                        if tunnel_output:
+                            f.write("=== TUNNEL OUTPUT ===\n")
+                            f.write(tunnel_output)
+                            f.write("\n")
+                            
+                            # Fallback for when the remote grep fails: match the
+                            # URL locally in the new complete lines
+                            lines, tunnel_pending = split_lines(tunnel_pending, tunnel_output)
+                            if args.wait_for_url and not tunnel_url:
+                                m = TUNNEL_RE.search("\n".join(lines))
+                                if m:
+                                    tunnel_url = m.group()
+                                    print(f"\n🌐 Tunnel URL found: {tunnel_url}")
                         
-                        # Check if ComfyUI is ready
-                        if not comfy_ready and "To see the GUI go to: http://0.0.0.0:8188" in comfy_output:
-                            comfy_ready = True
-                            print(f"\n🎨 ComfyUI is ready to serve!")
-                    
-                    # Break if we have everything we need
-                    if (not args.wait_for_url or tunnel_url) and comfy_ready:
-                        break
+                        # Pick up the tunnel URL once the remote grep has matched it
+                        if url_wait is not None and url_wait.done():
+                            finished, url_wait = url_wait, None
+                            remote_url = finished.result()
+                            if remote_url and not tunnel_url:
+                                tunnel_url = remote_url
+                                print(f"\n🌐 Tunnel URL found: {tunnel_url}")
+                        
+                        # A timed-out ready wait (None) stops blocking the exit check
+                        if ready_wait is not None and ready_wait.done():
+                            finished, ready_wait = ready_wait, None
+                            tunnel_ready = finished.result() is not None
+                            if tunnel_ready:
+                                print("\n🔗 Tunnel connection registered")
+                        
+                        # Check ComfyUI output
+                        if comfy_output:
+                            f.write("=== COMFYUI OUTPUT ===\n")
+                            f.write(comfy_output)
+                            f.write("\n")
                             
-                except Exception as e:
-                    if args.verbose:
-                        print(f"Error getting output: {e}")
-                
-                time.sleep(2)
+                            # Check if ComfyUI is ready
+                            lines, comfy_pending = split_lines(comfy_pending, comfy_output)
+                            if not comfy_ready and COMFY_READY_RE.search("\n".join(lines)):
+                                comfy_ready = True
+                                print(f"\n🎨 ComfyUI is ready to serve!")
+                        
+                        # Break if we have everything we need
+                        if (not args.wait_for_url or (tunnel_url and ready_wait is None)) and comfy_ready:
+                            break
+                                
+                    except Exception as e:
+                        if args.verbose:
+                            print(f"Error getting output: {e}")
+                    
+                    # One flush per tick keeps the file current for anyone tailing it
+                    f.flush()
+                    
+                    # Sleep until the next tick, waking early if a remote match arrives
+                    pending_waits = [w for w in (url_wait, ready_wait) if w is not None]
+                    if pending_waits:
+                        wait(pending_waits, timeout=2, return_when=FIRST_COMPLETED)
+                    else:
+                        time.sleep(2)
         
         print(f"\n✅ Setup complete!")
         print(f"📁 Tunnel output saved to: {output_file}")
@@ -151,6 +211,8 @@ def main():
         
         if tunnel_url:
             print(f"🌐 Tunnel URL: {tunnel_url}")
+            if not tunnel_ready:
+                print("⏳ Tunnel has not registered a connection yet - the URL may take a few seconds to respond")
             if comfy_ready:
                 print(f"🎨 ComfyUI is accessible at: {tunnel_url}")
             else:
@@ -167,6 +229,8 @@ def main():
         print(f"\nTo monitor sessions:")
         print(f"  Tunnel: tmux attach-session -t {args.tunnel_session}")
         print(f"  ComfyUI: tmux attach-session -t {args.comfy_session}")
+        print(f"\nTo follow the full session logs:")
+        print(f"  tail -f {tunnel_log} {comfy_log}")
         print(f"\nTo get more tunnel output:")
         print(f"  python -c \"from thunder_compute_manager import ThunderComputeManager; manager = ThunderComputeManager.from_secrets(); print(manager.get_tmux_output({args.instance_id}, '{args.tunnel_session}'))\"")
 
@@ -7,18 +7,23 @@ import argparse
 import sys
 import time
 import re
+import shlex
 from pathlib import Path
 
 # Add parent directory to path for thunder_compute_manager import
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from thunder_compute_manager import ThunderComputeManager
 
+# Look for patterns like https://something.trycloudflare.com
+TUNNEL_RE = re.compile(r'https://[a-zA-Z0-9-]+\.trycloudflare\.com')
+
 def extract_tunnel_url(output):
     """Extract tunnel URL from cloudflared output."""
-    # Look for patterns like https://something.trycloudflare.com
-    pattern = r'https://[a-zA-Z0-9-]+\.trycloudflare\.com'
-    matches = re.findall(pattern, output)
-    return matches[-1] if matches else None
+    # Only the last match is wanted, so don't build the full list
+    match = None
+    for match in TUNNEL_RE.finditer(output):
+        pass
+    return match.group(0) if match else None
 
 def main():
     parser = argparse.ArgumentParser(description="Start Cloudflare tunnel on ThunderCompute instance")
@@ -48,6 +53,9 @@ def main():
                 print("Instance is not running. Please start it first.")
                 sys.exit(1)
             
+            # One connection for the whole run; each command gets its own channel
+            ssh = manager.connect_ssh(instance_id)
+            
             # Install cloudflared if requested
             if args.install_cloudflared:
                 print("Installing cloudflared...")
@@ -59,23 +67,20 @@ def main():
                                 "/home/ubuntu/remote_scripts/install_cloudflared.sh",
                                 direction="upload")
                 
-                # Make executable and run
-                ssh = manager.connect_ssh(instance_id)
-                ssh.exec_command("chmod +x /home/ubuntu/remote_scripts/install_cloudflared.sh")
-                
-                manager.start_tmux_session(instance_id, "cloudflared-install")
+                # run_script_in_tmux runs it with bash and creates the session,
+                # so no chmod or separate session start is needed
                 manager.run_script_in_tmux(
                     instance_id,
                     "cloudflared-install", 
                     "/home/ubuntu/remote_scripts/install_cloudflared.sh",
                     wait_for_completion=True,
-                    wait_timeout=300
+                    wait_timeout=300,
+                    ssh=ssh
                 )
                 print("Cloudflared installation complete")
             
             # Check if tunnel session already exists
-            ssh = manager.connect_ssh(instance_id)
-            exit_code, _, _ = ssh.exec_command(f"tmux has-session -t {args.session_name}")
+            exit_code, _, _ = manager._run_ssh_command(ssh, f"tmux has-session -t {shlex.quote(args.session_name)}", timeout=30)
             
             if exit_code == 0:
                 print(f"Tunnel session '{args.session_name}' already exists")
@@ -88,12 +93,13 @@ def main():
                                 "/home/ubuntu/remote_scripts/start_tunnel_background.sh",
                                 direction="upload")
                 
-                ssh.exec_command("chmod +x /home/ubuntu/remote_scripts/start_tunnel_background.sh")
-                
-                # Start tunnel
+                # bash reads the script directly, so it needs no chmod
                 print(f"Starting Cloudflare tunnel on port {args.port}...")
-                exit_code, out, err = ssh.exec_command(
-                    f"/home/ubuntu/remote_scripts/start_tunnel_background.sh {args.port} {args.session_name}"
+                exit_code, out, err = manager._run_ssh_command(
+                    ssh,
+                    f'bash "/home/ubuntu/remote_scripts/start_tunnel_background.sh" '
+                    f'{args.port} {shlex.quote(args.session_name)}',
+                    timeout=60
                 )
                 
                 if exit_code != 0:
@@ -107,18 +113,28 @@ def main():
                 print("Waiting for tunnel URL...")
                 url = None
                 
-                for attempt in range(10):  # Try for 30 seconds
-                    time.sleep(3)
-                    output = manager.get_tmux_output(instance_id, args.session_name)
+                # Poll quickly at first (an existing session already has the
+                # URL), backing off to 3s between polls, for up to 30 seconds
+                delay = 0.2
+                deadline = time.time() + 30
+                attempt = 0
+                while time.time() < deadline:
+                    attempt += 1
+                    # After one full capture, only the recent tail can hold a
+                    # new URL; cloudflared prints far fewer than 100 lines between polls
+                    output = manager.get_tmux_output(instance_id, args.session_name,
+                                                     start_line=None if attempt == 1 else -100, ssh=ssh)
                     
                     if args.verbose:
-                        print(f"Tunnel output (attempt {attempt + 1}):")
+                        print(f"Tunnel output (attempt {attempt}):")
                         print(output)
                         print("-" * 40)
                     
                     url = extract_tunnel_url(output)
                     if url:
                         break
+                    time.sleep(max(0, min(delay, deadline - time.time())))
+                    delay = min(delay * 2, 3.0)
                 
                 if url:
                     print(f"\n🌐 Tunnel URL: {url}")
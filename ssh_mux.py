@@ -0,0 +1,133 @@
+"""
+OpenSSH ControlMaster helpers for ThunderCompute instances.
+
+Builds `ssh` command lines that share one multiplexed master connection per
+host, so repeated ssh/tar/rsync invocations (including ones from separate
+script runs) skip the TCP and key-exchange handshake after the first call.
+
+Set THUNDER_DISABLE_SSH_MUX=1 to disable multiplexing.
+"""
+
+import hashlib
+import os
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+CONTROL_PERSIST = "10m"
+
+
+def mux_enabled() -> bool:
+    """Check whether ControlMaster multiplexing is enabled"""
+    return os.environ.get("THUNDER_DISABLE_SSH_MUX", "").strip().lower() not in ("1", "true", "yes")
+
+
+def control_path(username: str, hostname: str, port: int, key_path: str) -> str:
+    """
+    Get the ControlPath socket for a host
+
+    The short hash of the key path keeps sockets for different keys (e.g. a
+    recycled IP with a new instance key) apart while staying well under the
+    unix socket path length limit.
+    """
+    short_hash = hashlib.sha1(str(key_path).encode()).hexdigest()[:8]
+    return str(Path.home() / ".ssh" / f"cm-{username}@{hostname}:{port}-{short_hash}")
+
+
+def base_options(key_path: str, port: int, keepalive_interval: int = 15) -> List[str]:
+    """Common ssh options matching ThunderComputeManager's paramiko settings"""
+    return [
+        "-i", str(key_path),
+        "-p", str(port),
+        "-o", "IdentitiesOnly=yes",
+        "-o", "BatchMode=yes",
+        "-o", "StrictHostKeyChecking=no",
+        "-o", "UserKnownHostsFile=/dev/null",
+        "-o", "LogLevel=ERROR",
+        "-o", f"ServerAliveInterval={int(keepalive_interval)}",
+        "-o", "ServerAliveCountMax=4",
+    ]
+
+
+def master_running(destination: str, socket_path: str) -> bool:
+    """Check if a master connection is alive on the given socket"""
+    if not Path(socket_path).exists():
+        return False
+    try:
+        result = subprocess.run(
+            ["ssh", "-O", "check", "-o", f"ControlPath={socket_path}", destination],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=5
+        )
+        return result.returncode == 0
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return False
+
+
+def start_master(destination: str, options: List[str], socket_path: str,
+                 timeout: float = 15.0) -> bool:
+    """
+    Start a background master connection if one is not already running
+
+    Args:
+        destination: user@host to connect to
+        options: Base ssh options (see base_options)
+        socket_path: ControlPath socket
+        timeout: Connection timeout in seconds
+
+    Returns:
+        True if a master is running, False if it could not be started
+    """
+    if master_running(destination, socket_path):
+        return True
+
+    Path(socket_path).parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+    # -f backgrounds ssh after authentication. The backgrounded master keeps
+    # its stdio open, so it must not inherit pipes we would wait on.
+    try:
+        result = subprocess.run(
+            ["ssh", *options,
+             "-o", f"ConnectTimeout={int(timeout)}",
+             "-o", "ControlMaster=yes",
+             "-o", f"ControlPath={socket_path}",
+             "-o", f"ControlPersist={CONTROL_PERSIST}",
+             "-MNf", destination],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=timeout + 5
+        )
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return False
+    return result.returncode == 0
+
+
+def stop_master(destination: str, socket_path: str) -> None:
+    """Ask a master connection to exit (best-effort)"""
+    if not Path(socket_path).exists():
+        return
+    try:
+        subprocess.run(
+            ["ssh", "-O", "exit", "-o", f"ControlPath={socket_path}", destination],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=5
+        )
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        pass
+
+
+def client_options(socket_path: Optional[str]) -> List[str]:
+    """
+    Options for a client riding on a master connection
+
+    ControlMaster=no means a missing or dead master falls back to a direct
+    connection instead of turning this client into a new master.
+    """
+    if not socket_path:
+        return []
+    return ["-o", "ControlMaster=no", "-o", f"ControlPath={socket_path}"]